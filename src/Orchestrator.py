@@ -1,41 +1,15 @@
-"""ADK Orchestrator - Main agent setup."""
-
-from google.adk.agents import Agent
-from google.adk.runners import Runner
-from google.adk.sessions import InMemorySessionService
-from google.adk.tools import FunctionTool
-
-from .config import logger
-from .utils import safe_tool_wrapper
-from .agents import (
-    analyze_mood,
-    play_stress_game,
-    analyze_interpersonal,
-    plan_meals,
-    plan_tasks,
-    get_nutrition_advice,
-    summarize_content,
-)
-
-# Wrap all agent functions with error handling
-wrapped_analyze_mood = safe_tool_wrapper(analyze_mood)
-wrapped_play_stress_game = safe_tool_wrapper(play_stress_game)
-wrapped_analyze_interpersonal = safe_tool_wrapper(analyze_interpersonal)
-wrapped_plan_meals = safe_tool_wrapper(plan_meals)
-wrapped_plan_tasks = safe_tool_wrapper(plan_tasks)
-wrapped_get_nutrition_advice = safe_tool_wrapper(get_nutrition_advice)
-wrapped_summarize_content = safe_tool_wrapper(summarize_content)
-
-# Create ADK FunctionTools
-ALL_TOOLS = [
-    FunctionTool(wrapped_analyze_mood),
-    FunctionTool(wrapped_play_stress_game),
-    FunctionTool(wrapped_analyze_interpersonal),
-    FunctionTool(wrapped_plan_meals),
-    FunctionTool(wrapped_plan_tasks),
-    FunctionTool(wrapped_get_nutrition_advice),
-    FunctionTool(wrapped_summarize_content),
-]
+"""ADK Orchestrator - Main agent setup.
+
+The ADK agent, session service and runner are built lazily on first use so
+that importing the package (or a single agent function) stays cheap.
+"""
+
+import asyncio
+import functools
+from typing import AsyncIterator, Dict, List, Tuple
+
+from .config import logger, MAX_CONCURRENCY
+from .tools import all_tools
 
 # System instruction
 SYSTEM_INSTRUCTION = """
@@ -108,21 +82,174 @@ You are MindMate AI, a compassionate wellness companion powered by 7 specialized
 When uncertain which agent to use, ask clarifying questions to better help the user.
 """
 
-# Create ADK Agent
-mindmate_agent = Agent(
-    name="mindmate",
-    model="gemini-2.5-flash",  # Using correct model identifier
-    description="MindMate AI - Your wellness companion with 7 specialized agents",
-    instruction=SYSTEM_INSTRUCTION,
-    tools=ALL_TOOLS
-)
-
-# Create session service and runner
-session_service = InMemorySessionService()
-runner = Runner(
-    agent=mindmate_agent, 
-    app_name="mindmate",
-    session_service=session_service
-)
-
-logger.info("✅ Mindmate AI orchestrator ready with 7 agents")
+
+@functools.cache
+def get_agent():
+    """Create the ADK agent with all 7 tools (built once)."""
+    from google.adk.agents import Agent
+    
+    agent = Agent(
+        name="mindmate",
+        model="gemini-2.5-flash",  # Using correct model identifier
+        description="MindMate AI - Your wellness companion with 7 specialized agents",
+        instruction=SYSTEM_INSTRUCTION,
+        tools=list(all_tools())
+    )
+    logger.info("✅ Mindmate AI orchestrator ready with 7 agents")
+    return agent
+
+
+@functools.cache
+def get_session_service():
+    """Create the shared in-memory session service (built once)."""
+    from google.adk.sessions import InMemorySessionService
+    
+    return InMemorySessionService()
+
+
+@functools.cache
+def get_runner():
+    """Create the runner bound to the agent and session service (built once)."""
+    from google.adk.runners import Runner
+    
+    return Runner(
+        agent=get_agent(),
+        app_name="mindmate",
+        session_service=get_session_service()
+    )
+
+
+_LAZY_ATTRIBUTES = {
+    "mindmate_agent": get_agent,
+    "session_service": get_session_service,
+    "runner": get_runner,
+}
+
+
+def __getattr__(name: str):
+    """Resolve mindmate_agent / session_service / runner on first access."""
+    if name in _LAZY_ATTRIBUTES:
+        return _LAZY_ATTRIBUTES[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _user_message(message: str):
+    """Wrap plain text as a user Content for the runner."""
+    from google.genai import types as genai_types
+    
+    return genai_types.Content(
+        role="user",
+        parts=[genai_types.Part.from_text(text=message)]
+    )
+
+
+# Session id reused for each user's chat turns
+_SESSIONS: Dict[str, str] = {}
+
+
+async def _get_session_id(user_id: str) -> str:
+    """Return the user's chat session, creating it on first use."""
+    session_id = _SESSIONS.get(user_id)
+    if session_id is None:
+        session = await get_session_service().create_session(app_name="mindmate", user_id=user_id)
+        session_id = _SESSIONS[user_id] = session.id
+    return session_id
+
+
+async def reset_session(user_id: str) -> None:
+    """Forget the user's chat session so the next message starts fresh."""
+    session_id = _SESSIONS.pop(user_id, None)
+    if session_id is not None:
+        await get_session_service().delete_session(
+            app_name="mindmate",
+            user_id=user_id,
+            session_id=session_id
+        )
+
+
+async def _final_response(user_id: str, session_id: str, message: str) -> str:
+    """Run one message through the agent and return the final reply text."""
+    async for event in get_runner().run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=_user_message(message),
+    ):
+        if event.is_final_response() and event.content and event.content.parts:
+            return event.content.parts[0].text or ""
+    
+    return ""
+
+
+async def chat(user_id: str, message: str) -> str:
+    """
+    Send one message to MindMate in the user's ongoing session.
+    
+    Parameters:
+    - user_id: User identifier
+    - message: User's message
+    
+    Returns: Final response text from the agent
+    """
+    return await _final_response(user_id, await _get_session_id(user_id), message)
+
+
+async def stream_chat(user_id: str, message: str) -> AsyncIterator[str]:
+    """
+    Stream MindMate's reply as text chunks while the model is generating.
+    
+    Uses ADK's SSE streaming mode so the first tokens can be shown before
+    the full response is ready.
+    
+    Usage:
+        async for chunk in stream_chat("sam_1", "I feel stressed"):
+            print(chunk, end="", flush=True)
+    """
+    from google.adk.agents.run_config import RunConfig, StreamingMode
+    
+    session_id = await _get_session_id(user_id)
+    streamed = False
+    
+    async for event in get_runner().run_async(
+        user_id=user_id,
+        session_id=session_id,
+        new_message=_user_message(message),
+        run_config=RunConfig(streaming_mode=StreamingMode.SSE),
+    ):
+        if not (event.content and event.content.parts):
+            continue
+        
+        text = "".join(part.text or "" for part in event.content.parts)
+        if event.partial:
+            streamed = True
+            yield text
+        elif event.is_final_response() and not streamed:
+            # Nothing was streamed (e.g. non-text turns), emit the full reply
+            yield text
+
+
+async def chat_batch(messages: List[Tuple[str, str]]) -> List[str]:
+    """
+    Run many (user_id, message) pairs concurrently.
+    
+    Each message gets its own session so concurrent runs never share
+    history. Gemini calls overlap on the network, bounded by
+    MINDMATE_MAX_CONCURRENCY so the backend is not flooded.
+    
+    Returns: Responses in the same order as the input
+    """
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    
+    async def _run(user_id: str, message: str) -> str:
+        async with semaphore:
+            session = await get_session_service().create_session(app_name="mindmate", user_id=user_id)
+            try:
+                return await _final_response(user_id, session.id, message)
+            finally:
+                # Batch sessions are single-use; drop them so the store does not grow
+                await get_session_service().delete_session(
+                    app_name="mindmate",
+                    user_id=user_id,
+                    session_id=session.id
+                )
+    
+    return await asyncio.gather(*[_run(user_id, message) for user_id, message in messages])
@@ -6,7 +6,7 @@ __version__ = "1.0.0"
 __author__ = "Sridevi V"
 
 # Import key components for easy access
-from .Orchestrator import mindmate_agent, runner, session_service
+from .Orchestrator import get_agent, get_runner, get_session_service
 from .config import logger
 from .user_model import get_user, get_greeting
 from .agents import (
@@ -24,6 +24,9 @@ __all__ = [
     "mindmate_agent",
     "runner",
     "session_service",
+    "get_agent",
+    "get_runner",
+    "get_session_service",
     
     # Utilities
     "logger",
@@ -39,3 +42,11 @@ __all__ = [
     "get_nutrition_advice",
     "summarize_content",
 ]
+
+
+def __getattr__(name: str):
+    """Build the ADK runtime objects only when they are first accessed."""
+    if name in ("mindmate_agent", "runner", "session_service"):
+        from . import Orchestrator
+        return getattr(Orchestrator, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
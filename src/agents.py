@@ -4,67 +4,109 @@ import time
 import re
 import os
 import json
+import random
 import logging
+import statistics
+import shutil
+import functools
 import traceback
-import tempfile
-from typing import Dict, Optional
+import subprocess
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from importlib.util import find_spec
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
 
-# Core imports
-import speech_recognition as sr
-from PIL import Image
-
-# Optional imports with graceful fallbacks
-try:
-    import librosa
-    import numpy as np
-    LIBROSA_AVAILABLE = True
-except ImportError:
-    LIBROSA_AVAILABLE = False
+# Optional dependencies are only checked here and imported on first use,
+# so text-only requests never load the audio, PDF or web stacks
+# (config.py still imports google.generativeai when GOOGLE_API_KEY is set)
+LIBROSA_AVAILABLE = find_spec("librosa") is not None and find_spec("numpy") is not None
+if not LIBROSA_AVAILABLE:
     logging.warning("librosa not available - audio analysis will be limited")
 
-try:
-    from pydub import AudioSegment
-    PYDUB_AVAILABLE = True
-except ImportError:
-    PYDUB_AVAILABLE = False
+PYDUB_AVAILABLE = find_spec("pydub") is not None
+if not PYDUB_AVAILABLE:
     logging.warning("pydub not available - audio conversion limited")
 
-try:
-    from pypdf import PdfReader
-    PYPDF_AVAILABLE = True
-except ImportError:
-    try:
-        import PyPDF2
-        from PyPDF2 import PdfReader
-        PYPDF_AVAILABLE = True
-    except ImportError:
-        PYPDF_AVAILABLE = False
-        logging.warning("pypdf/PyPDF2 not available - PDF support disabled")
+# ffmpeg decodes compressed audio straight into memory when present
+FFMPEG_PATH = shutil.which("ffmpeg")
 
-try:
-    import requests
-    from bs4 import BeautifulSoup
-    WEB_SCRAPING_AVAILABLE = True
-except ImportError:
-    WEB_SCRAPING_AVAILABLE = False
+SOUNDFILE_AVAILABLE = find_spec("soundfile") is not None
+
+# PyMuPDF extracts text in C; pypdf/PyPDF2 are the pure-Python fallback
+FITZ_AVAILABLE = find_spec("fitz") is not None
+PYPDF_AVAILABLE = FITZ_AVAILABLE or find_spec("pypdf") is not None or find_spec("PyPDF2") is not None
+if not PYPDF_AVAILABLE:
+    logging.warning("PyMuPDF/pypdf/PyPDF2 not available - PDF support disabled")
+
+WEB_SCRAPING_AVAILABLE = find_spec("requests") is not None and find_spec("bs4") is not None
+if not WEB_SCRAPING_AVAILABLE:
     logging.warning("requests/BeautifulSoup not available - URL support disabled")
 
 try:
-    import google.generativeai as genai
-    GENAI_AVAILABLE = True
-except ImportError:
+    GENAI_AVAILABLE = find_spec("google.generativeai") is not None
+except ModuleNotFoundError:
+    # find_spec raises when the parent "google" package is missing
     GENAI_AVAILABLE = False
+if not GENAI_AVAILABLE:
     logging.warning("google.generativeai not available - AI features limited")
 
-from .config import logger
-from .user_model import get_user, get_greeting, user_journeys
-from .utils import metric_inc, metric_time, safe_file_read
+from .config import logger, AUDIO_SAMPLE_RATE, AUDIO_RESAMPLE_TYPE, MAX_AUDIO_DURATION_SEC, MAX_PDF_PAGES, \
+    AUDIO_DISK_CACHE_ENABLED, AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_ENTRIES, AUDIO_CACHE_TTL_SEC
+from .user_model import get_user, format_greeting, user_journeys
+from .utils import file_digest, metric_record, safe_file_read
 
 
 # ============================================================================
 # AGENT 1 - MOOD AGENT
 # ============================================================================
 
+# Emotion buckets in priority order: emotion -> (score, keywords)
+EMOTION_MAP = {
+    "distressed": (2, ("depressed", "hopeless", "terrible", "suicidal", "can't go on")),
+    "anxious": (3, ("anxious", "stressed", "worried", "overwhelmed", "panic")),
+    "sad": (4, ("sad", "down", "lonely", "upset", "disappointed")),
+    "neutral": (5, ("okay", "meh", "alright", "so-so")),
+    "stable": (6, ("fine", "decent", "not bad")),
+    "positive": (7, ("good", "better", "nice", "pleased")),
+    "very_positive": (8, ("great", "happy", "amazing", "wonderful", "fantastic")),
+    "excellent": (9, ("excellent", "thrilled", "ecstatic", "best"))
+}
+
+# Keyword -> (bucket rank, emotion, score); the lowest rank wins
+EMOTION_KEYWORDS = {
+    keyword: (rank, emo, emo_score)
+    for rank, (emo, (emo_score, keywords)) in enumerate(EMOTION_MAP.items())
+    for keyword in keywords
+}
+
+# All keywords in one pattern so a message is scanned once. Alternation is
+# leftmost-first, so longer phrases go first to win over their prefixes.
+# Only the start is anchored: inflections ("hopelessness", "panicking",
+# "sadness") must still match, as they did with substring checks.
+EMOTION_RE = re.compile(
+    r"\b(?:" + "|".join(map(re.escape, sorted(EMOTION_KEYWORDS, key=len, reverse=True))) + r")",
+    re.IGNORECASE
+)
+
+# Coping response per score band: (upper score bound, template, assessment)
+COPING_TABLE = (
+    (2, "💙 {name}, I hear you're going through a really tough time. Please remember you're not alone. Consider reaching out to a mental health professional or crisis line. Would you like some grounding exercises?", "needs_immediate_support"),
+    (4, "💙 {name}, try this: 4-7-8 breathing - inhale 4 seconds, hold 7, exhale 8. Repeat 4 times. Would you like a stress relief game?", "needs_support"),
+    (6, "{name}, you're managing okay. A short walk or talking to someone you trust might help lift your mood.", "stable"),
+    (10, "Wonderful, {name}! Keep doing what's working for you. Gratitude journaling can help maintain this positive state.", "thriving"),
+)
+# COPING_TABLE row for every possible mood score (index 0-10)
+COPING_ROW_BY_SCORE = tuple(
+    next(row for row, (bound, _, _) in enumerate(COPING_TABLE) if score <= bound)
+    for score in range(11)
+)
+
+# Mood points per check-in above/below which the trend counts as moving
+TREND_SLOPE_THRESHOLD = 0.2
+
+
 def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
     """
     Analyze user's emotional state and provide personalized support.
@@ -76,30 +118,23 @@ def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
     
     Returns: Mood analysis with coping strategies
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
-    lower = message.lower()
     
     # Emotion detection
-    emotion_map = {
-        "distressed": (2, ["depressed", "hopeless", "terrible", "suicidal", "can't go on"]),
-        "anxious": (3, ["anxious", "stressed", "worried", "overwhelmed", "panic"]),
-        "sad": (4, ["sad", "down", "lonely", "upset", "disappointed"]),
-        "neutral": (5, ["okay", "meh", "alright", "so-so"]),
-        "stable": (6, ["fine", "decent", "not bad"]),
-        "positive": (7, ["good", "better", "nice", "pleased"]),
-        "very_positive": (8, ["great", "happy", "amazing", "wonderful", "fantastic"]),
-        "excellent": (9, ["excellent", "thrilled", "ecstatic", "best"])
-    }
-    
     score = 5
     emotion = "neutral"
     
-    for emo, (emo_score, keywords) in emotion_map.items():
-        if any(w in lower for w in keywords):
-            score = emo_score
-            emotion = emo
-            break
+    best = None
+    for match in EMOTION_RE.finditer(message):
+        hit = EMOTION_KEYWORDS[match.group(0).lower()]
+        if best is None or hit[0] < best[0]:
+            best = hit
+            if hit[0] == 0:
+                break
+    
+    if best:
+        _, emotion, score = best
     
     # Adjust for stress level
     score = max(1, min(10, score - (stress_level - 5) // 2))
@@ -112,33 +147,20 @@ def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
         "stress": stress_level
     })
     user.stress_history.append(stress_level)
-    
-    # Keep last 20 entries
-    if len(user.emotion_history) > 20:
-        user.emotion_history = user.emotion_history[-20:]
-    if len(user.stress_history) > 20:
-        user.stress_history = user.stress_history[-20:]
+    user.score_history.append(score)
     
     # Generate coping strategy
-    if score <= 2:
-        coping = f"💙 {user.name}, I hear you're going through a really tough time. Please remember you're not alone. Consider reaching out to a mental health professional or crisis line. Would you like some grounding exercises?"
-        assessment = "needs_immediate_support"
-    elif score <= 4:
-        coping = f"💙 {user.name}, try this: 4-7-8 breathing - inhale 4 seconds, hold 7, exhale 8. Repeat 4 times. Would you like a stress relief game?"
-        assessment = "needs_support"
-    elif score <= 6:
-        coping = f"{user.name}, you're managing okay. A short walk or talking to someone you trust might help lift your mood."
-        assessment = "stable"
-    else:
-        coping = f"Wonderful, {user.name}! Keep doing what's working for you. Gratitude journaling can help maintain this positive state."
-        assessment = "thriving"
-    
-    # Calculate trend
-    if len(user.emotion_history) >= 3:
-        recent_scores = [e["score"] for e in user.emotion_history[-3:]]
-        if recent_scores[-1] > recent_scores[0]:
+    _, template, assessment = COPING_TABLE[COPING_ROW_BY_SCORE[score]]
+    coping = template.format(name=user.name)
+    
+    # Calculate trend: least-squares slope over the whole history window
+    scores = user.score_history
+    trend_slope = None
+    if len(scores) >= 3:
+        trend_slope = statistics.linear_regression(range(len(scores)), scores).slope
+        if trend_slope > TREND_SLOPE_THRESHOLD:
             trend = "improving 📈"
-        elif recent_scores[-1] < recent_scores[0]:
+        elif trend_slope < -TREND_SLOPE_THRESHOLD:
             trend = "declining 📉"
         else:
             trend = "stable ➡️"
@@ -147,8 +169,7 @@ def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
     
     # Award points
     user.total_points += 5
-    metric_inc("mood_analyses")
-    metric_time("mood_agent", time.time() - start)
+    metric_record("mood_analyses", "mood_agent", time.perf_counter() - start)
     
     return {
         "mood_score": score,
@@ -157,9 +178,10 @@ def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
         "assessment": assessment,
         "coping_strategy": coping,
         "trend": trend,
+        "trend_slope": None if trend_slope is None else round(trend_slope, 2),
         "points_earned": 5,
         "total_points": user.total_points,
-        "greeting": get_greeting(user_id)
+        "greeting": format_greeting(user)
     }
 
 
@@ -167,6 +189,44 @@ def analyze_mood(user_id: str, message: str, stress_level: int = 5) -> Dict:
 # AGENT 2 - STRESS BUSTER (GAMES)
 # ============================================================================
 
+@dataclass(frozen=True, slots=True)
+class Game:
+    """One stress-buster game; "{name}" in the question is filled in when picked."""
+    question: str
+    answer: str
+    options: Tuple[str, ...] = ()
+    hint: Optional[str] = None
+    fact: Optional[str] = None
+
+
+# Game catalog by type
+GAMES = {
+    "riddle": (
+        Game(question="🤔 {name}, I speak without a mouth and hear without ears. I have no body, but I come alive with the wind. What am I?", answer="An ECHO! 🔊"),
+        Game(question="🤔 {name}, what has keys but no locks, space but no room, and you can enter but can't go inside?", answer="A KEYBOARD! ⌨️"),
+        Game(question="🤔 The more you take, the more you leave behind. What am I?", answer="FOOTSTEPS! 👣"),
+    ),
+    "trivia": (
+        Game(question="🎬 In Stranger Things, what tabletop game do the kids play?", options=("A) Monopoly", "B) Dungeons & Dragons", "C) Risk"), answer="B) Dungeons & Dragons ✅", fact="The Duffer Brothers are huge D&D fans!"),
+        Game(question="🎵 Which artist has the most Grammy Awards?", options=("A) Beyoncé", "B) Taylor Swift", "C) Adele"), answer="A) Beyoncé ✅", fact="She has 32 Grammy Awards!"),
+    ),
+    "brain_teaser": (
+        Game(question="🧠 {name}, a bus driver goes the wrong way down a one-way street, passes 10 police officers, but doesn't get a ticket. Why?", answer="He was WALKING! 🚶"),
+        Game(question="🧠 What can you hold in your right hand but never in your left hand?", answer="Your LEFT HAND! 🤚"),
+    ),
+    "pattern": (
+        Game(question="🔢 What comes next? 2, 4, 8, 16, ?", answer="32 (each number doubles)"),
+        Game(question="🔢 What comes next? 1, 1, 2, 3, 5, 8, ?", answer="13 (Fibonacci sequence)"),
+    ),
+    "detective": (
+        Game(question="🔍 {name}, a man is found dead with only water and broken glass. How?", hint="Think about what was IN the glass...", answer="🎯 He was a fish! The glass was his fishbowl!"),
+    )
+}
+
+# Game categories, in the order offered
+GAME_TYPES = tuple(GAMES)
+
+
 def play_stress_game(user_id: str, game_type: str = "random") -> Dict:
     """
     Provide fun mental break games for stress relief.
@@ -177,59 +237,36 @@ def play_stress_game(user_id: str, game_type: str = "random") -> Dict:
     
     Returns: Game content with question and answer
     """
-    import random
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
     
-    games = {
-        "riddle": [
-            {"q": f"🤔 {user.name}, I speak without a mouth and hear without ears. I have no body, but I come alive with the wind. What am I?", "a": "An ECHO! 🔊"},
-            {"q": f"🤔 {user.name}, what has keys but no locks, space but no room, and you can enter but can't go inside?", "a": "A KEYBOARD! ⌨️"},
-            {"q": "🤔 The more you take, the more you leave behind. What am I?", "a": "FOOTSTEPS! 👣"},
-        ],
-        "trivia": [
-            {"q": "🎬 In Stranger Things, what tabletop game do the kids play?", "opts": ["A) Monopoly", "B) Dungeons & Dragons", "C) Risk"], "a": "B) Dungeons & Dragons ✅", "fact": "The Duffer Brothers are huge D&D fans!"},
-            {"q": "🎵 Which artist has the most Grammy Awards?", "opts": ["A) Beyoncé", "B) Taylor Swift", "C) Adele"], "a": "A) Beyoncé ✅", "fact": "She has 32 Grammy Awards!"},
-        ],
-        "brain_teaser": [
-            {"q": f"🧠 {user.name}, a bus driver goes the wrong way down a one-way street, passes 10 police officers, but doesn't get a ticket. Why?", "a": "He was WALKING! 🚶"},
-            {"q": "🧠 What can you hold in your right hand but never in your left hand?", "a": "Your LEFT HAND! 🤚"},
-        ],
-        "pattern": [
-            {"q": "🔢 What comes next? 2, 4, 8, 16, ?", "a": "32 (each number doubles)"},
-            {"q": "🔢 What comes next? 1, 1, 2, 3, 5, 8, ?", "a": "13 (Fibonacci sequence)"},
-        ],
-        "detective": [
-            {"q": f"🔍 {user.name}, a man is found dead with only water and broken glass. How?", "hint": "Think about what was IN the glass...", "a": "🎯 He was a fish! The glass was his fishbowl!"},
-        ]
-    }
-    
     # Select game type
-    if game_type == "random" or game_type not in games:
-        recent = user.game_scores.get("recent_types", [])
-        available = [t for t in games.keys() if t not in recent[-2:]]
-        game_type = random.choice(available if available else list(games.keys()))
+    if game_type == "random" or game_type not in GAMES:
+        # Skip the last two types played
+        recent = user.recent_game_types
+        weights = [0 if t in recent else 1 for t in GAME_TYPES]
+        game_type = random.choices(GAME_TYPES, weights=weights)[0]
     
-    selected = random.choice(games[game_type])
+    selected = random.choice(GAMES[game_type])
+    question = selected.question
+    if "{name}" in question:
+        question = question.format(name=user.name)
     
     result = {
         "game_type": game_type,
-        "question": selected["q"],
-        "answer": selected["a"],
-        "hint": selected.get("hint"),
-        "options": selected.get("opts", []),
-        "fun_fact": selected.get("fact"),
+        "question": question,
+        "answer": selected.answer,
+        "hint": selected.hint,
+        "options": list(selected.options),
+        "fun_fact": selected.fact,
     }
     
     user.streaks["games"] = user.streaks.get("games", 0) + 1
     user.total_points += 10
     
-    if "recent_types" not in user.game_scores:
-        user.game_scores["recent_types"] = []
-    user.game_scores["recent_types"].append(game_type)
-    
-    total_played = user.game_scores.get("total_played", 0) + 1
-    user.game_scores["total_played"] = total_played
+    user.recent_game_types.append(game_type)
+    user.total_games_played += 1
+    total_played = user.total_games_played
     
     result["stats"] = {
         "streak": user.streaks["games"],
@@ -239,8 +276,7 @@ def play_stress_game(user_id: str, game_type: str = "random") -> Dict:
     }
     result["message"] = f"🎯 Game #{total_played}! Take a brain break, {user.name}! 🧠✨"
     
-    metric_inc("games_played")
-    metric_time("stress_buster", time.time() - start)
+    metric_record("games_played", "stress_buster", time.perf_counter() - start)
     
     return result
 
@@ -249,23 +285,147 @@ def play_stress_game(user_id: str, game_type: str = "random") -> Dict:
 # AGENT 3 - INTERPERSONAL COACH
 # ============================================================================
 
-def analyze_audio_features(audio_path: str) -> Dict:
-    """Analyze vocal characteristics: tone, pace, volume, clarity, pitch."""
+AUDIO_EXTENSIONS = ['.wav', '.mp3', '.m4a', '.mp4', '.ogg', '.flac']
+
+# Frame and hop sizes for framewise features (librosa's defaults)
+AUDIO_FRAME_LENGTH = 2048
+AUDIO_HOP_LENGTH = 512
+
+# Bump when feature extraction changes so cached results are not reused
+ANALYSIS_VERSION = 1
+AUDIO_CACHE_SIZE = 128
+
+# (file digest, sample rate, ANALYSIS_VERSION) -> features, least recent first
+_audio_feature_cache: Dict[tuple, Dict] = OrderedDict()
+_audio_feature_cache_lock = threading.Lock()
+
+# Communication patterns by category: (pattern, description)
+COMMUNICATION_PATTERNS = {
+    "aggressive": (
+        (r"\byou always\b", "Absolute blame"),
+        (r"\byou never\b", "Absolute blame"),
+        (r"\byou should\b", "Commanding tone"),
+    ),
+    "assertive": (
+        # Lookahead keeps the match short so later patterns are still found
+        (r"\bi feel\b(?=.*\bwhen\b)", "✅ Great 'I feel when' statement!"),
+        (r"\bi think\b", "✅ Owning your opinion"),
+    ),
+}
+
+# Named group -> (category, description), fused into one pattern so a
+# message is scanned once
+COMMUNICATION_GROUPS = {
+    f"{category}_{i}": (category, desc)
+    for category, patterns in COMMUNICATION_PATTERNS.items()
+    for i, (_, desc) in enumerate(patterns)
+}
+
+COMMUNICATION_RE = re.compile(
+    "|".join(
+        f"(?P<{category}_{i}>{p})"
+        for category, patterns in COMMUNICATION_PATTERNS.items()
+        for i, (p, _) in enumerate(patterns)
+    ),
+    re.I
+)
+
+# Coaching lines per outcome; {name} is filled in per user
+AGGRESSIVE_COACHING = ("Replace 'you always' with 'when this happens, I feel...'",)
+POSITIVE_COACHING = ("Great work, {name}!",)
+
+
+def _audio_header_duration(audio_path: str) -> Optional[float]:
+    """Read the duration from the file header only, or None if it can't be read."""
+    if not SOUNDFILE_AVAILABLE:
+        return None
+    
+    import soundfile
+    
+    try:
+        return soundfile.info(audio_path).duration
+    except Exception:
+        # e.g. M4A/MP4, which libsndfile cannot parse
+        return None
+
+
+def _decode_to_pcm(audio_path: str) -> bytes:
+    """Decode any audio file to 16-bit mono PCM at AUDIO_SAMPLE_RATE, in memory."""
+    if FFMPEG_PATH:
+        return subprocess.run(
+            [FFMPEG_PATH, "-nostdin", "-loglevel", "error", "-i", audio_path,
+             "-ac", "1", "-ar", str(AUDIO_SAMPLE_RATE), "-f", "s16le", "-"],
+            capture_output=True, check=True
+        ).stdout
+    
+    from pydub import AudioSegment
+    
+    audio = AudioSegment.from_file(audio_path)
+    return audio.set_channels(1).set_frame_rate(AUDIO_SAMPLE_RATE).set_sample_width(2).raw_data
+
+
+def analyze_audio_features(audio_path: str, samples=None, digest: Optional[str] = None) -> Dict:
+    """
+    Analyze vocal characteristics: tone, pace, volume, clarity, pitch.
+    
+    Parameters:
+    - audio_path: Path to the audio file (also used as the cache key)
+    - samples: Already-decoded float32 mono samples at AUDIO_SAMPLE_RATE (optional)
+    - digest: file_digest(audio_path) if the caller already computed it (optional)
+    
+    Returns: Feature dict with status
+    """
     if not LIBROSA_AVAILABLE:
         return {"status": "limited", "message": "librosa not available - only basic transcription"}
     
+    # Same audio content -> same features, so skip the reanalysis
+    try:
+        key = (digest or file_digest(audio_path), AUDIO_SAMPLE_RATE, ANALYSIS_VERSION)
+    except OSError as e:
+        return {"status": "error", "message": str(e)}
+    
+    with _audio_feature_cache_lock:
+        cached = _audio_feature_cache.get(key)
+        if cached is not None:
+            _audio_feature_cache.move_to_end(key)
+            return cached
+    
+    features = _compute_audio_features(audio_path, samples)
+    if features["status"] == "success":
+        with _audio_feature_cache_lock:
+            _audio_feature_cache[key] = features
+            if len(_audio_feature_cache) > AUDIO_CACHE_SIZE:
+                _audio_feature_cache.popitem(last=False)
+    
+    return features
+
+
+def _compute_audio_features(audio_path: str, samples=None) -> Dict:
+    """Run the librosa feature pipeline on one audio file (uncached)."""
     try:
         import librosa
         import numpy as np
+    except ImportError as e:
+        # find_spec only saw the package; a broken install (e.g. numba/llvmlite mismatch) still fails here
+        logger.warning(f"librosa failed to import: {e}")
+        return {"status": "limited", "message": "librosa not available - only basic transcription"}
+    
+    try:
+        if samples is not None:
+            y, sr_rate = samples, AUDIO_SAMPLE_RATE
+        else:
+            # Mono at 16 kHz; librosa skips resampling when the file already matches
+            y, sr_rate = librosa.load(audio_path, sr=AUDIO_SAMPLE_RATE, mono=True, res_type=AUDIO_RESAMPLE_TYPE)
         
-        y, sr_rate = librosa.load(audio_path, sr=None)
-        duration = librosa.get_duration(y=y, sr=sr_rate)
+        # No-op for both decode paths above; guards caller-supplied float64/strided arrays
+        y = np.ascontiguousarray(y, dtype=np.float32)
+        duration = y.shape[-1] / sr_rate
         
         if duration < 0.5:
             return {"status": "error", "message": "Audio too short (min 0.5 seconds)"}
         
-        # Volume analysis
-        rms = librosa.feature.rms(y=y)[0]
+        # Volume analysis (time-domain RMS; the 0.15/0.03 thresholds were tuned on it)
+        rms = librosa.feature.rms(y=y, frame_length=AUDIO_FRAME_LENGTH, hop_length=AUDIO_HOP_LENGTH)[0]
         avg_volume = float(np.mean(rms))
         
         if avg_volume > 0.15:
@@ -279,7 +439,10 @@ def analyze_audio_features(audio_path: str) -> Dict:
             volume_note = "Good volume - clear and audible"
         
         # Pace analysis
-        onset_frames = librosa.onset.onset_detect(y=y, sr=sr_rate, backtrack=False)
+        # Default mel-spectrogram onset envelope, as the 2/4 per-second thresholds assume
+        onset_frames = librosa.onset.onset_detect(
+            y=y, sr=sr_rate, hop_length=AUDIO_HOP_LENGTH, backtrack=False
+        )
         pace_per_sec = len(onset_frames) / duration if duration > 0 else 0
         
         if pace_per_sec > 4:
@@ -310,6 +473,56 @@ def analyze_audio_features(audio_path: str) -> Dict:
         return {"status": "error", "message": str(e)}
 
 
+def _audio_cache_path(digest: str):
+    """On-disk cache file for one audio upload's transcript and features."""
+    return AUDIO_CACHE_DIR / f"{digest}-{AUDIO_SAMPLE_RATE}-v{ANALYSIS_VERSION}.json"
+
+
+def _read_audio_cache(digest: str) -> Optional[Dict]:
+    """Return the cached {"transcript", "features"} record, or None on a miss."""
+    if not AUDIO_DISK_CACHE_ENABLED:
+        return None
+    path = _audio_cache_path(digest)
+    try:
+        if time.time() - path.stat().st_mtime > AUDIO_CACHE_TTL_SEC:
+            path.unlink(missing_ok=True)
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _prune_audio_cache() -> None:
+    """Drop the oldest cache files beyond AUDIO_CACHE_MAX_ENTRIES."""
+    entries = []
+    for path in AUDIO_CACHE_DIR.glob("*.json"):
+        try:
+            entries.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    entries.sort(reverse=True)
+    for _, path in entries[AUDIO_CACHE_MAX_ENTRIES:]:
+        path.unlink(missing_ok=True)
+
+
+def _write_audio_cache(digest: str, transcript: str, features: Dict) -> None:
+    """Atomically store a transcript and features so other processes can reuse them."""
+    if not AUDIO_DISK_CACHE_ENABLED:
+        return
+    path = _audio_cache_path(digest)
+    tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        AUDIO_CACHE_DIR.mkdir(mode=0o700, parents=True, exist_ok=True)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with open(fd, "w", encoding="utf-8") as f:
+            json.dump({"transcript": transcript, "features": features}, f)
+        os.replace(tmp_path, path)
+        _prune_audio_cache()
+    except OSError as e:
+        logger.warning(f"Could not write audio cache: {e}")
+
+
 def analyze_interpersonal(
     user_id: str,
     text: Optional[str] = None,
@@ -327,41 +540,63 @@ def analyze_interpersonal(
     
     Returns: Communication analysis with coaching
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
     
-    # Audio transcription
+    # Audio transcription; typed text is coached as-is and the audio is ignored
     transcript = None
     audio_features = None
     
-    if audio_path:
+    if audio_path and not text:
+        import speech_recognition as sr
+        
         try:
-            valid_extensions = ['.wav', '.mp3', '.m4a', '.mp4', '.ogg', '.flac']
-            file_ext = os.path.splitext(audio_path)[1].lower()
+            # Extension, existence and size from a single stat call
+            validation = safe_file_read(audio_path, AUDIO_EXTENSIONS)
+            if validation["status"] == "error":
+                return {"status": "error", "message": validation["error"]}
             
-            if file_ext not in valid_extensions:
-                return {"status": "error", "message": f"Unsupported format: {file_ext}"}
+            file_ext = os.path.splitext(audio_path)[1].lower()
             
-            if not os.path.exists(audio_path):
-                return {"status": "error", "message": "Audio file not found"}
+            # Reject unusable lengths before paying for a full decode
+            duration = _audio_header_duration(audio_path)
+            if duration is not None and duration < 0.5:
+                return {"status": "error", "message": "Audio too short (min 0.5 seconds)"}
+            if duration is not None and duration > MAX_AUDIO_DURATION_SEC:
+                return {"status": "error", "message": f"Audio too long (max {MAX_AUDIO_DURATION_SEC} seconds)"}
             
-            # Convert to WAV if needed
-            if not audio_path.endswith('.wav') and PYDUB_AVAILABLE:
-                audio = AudioSegment.from_file(audio_path)
-                with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as tmp:
-                    wav_path = tmp.name
-                audio.export(wav_path, format="wav")
-                audio_path = wav_path
+            # Identical uploads reuse the stored transcript and features
+            digest = file_digest(audio_path)
+            cached = _read_audio_cache(digest)
             
-            # Transcribe
-            recognizer = sr.Recognizer()
-            with sr.AudioFile(audio_path) as source:
-                audio_data = recognizer.record(source)
-                transcript = recognizer.recognize_google(audio_data)
+            if cached is not None:
+                audio_features = cached["features"]
+                transcript = text = cached["transcript"]
+            else:
+                recognizer = sr.Recognizer()
+                samples = None
+                audio_data = None
+                
+                if file_ext != '.wav' and (FFMPEG_PATH or PYDUB_AVAILABLE):
+                    # Decode once in memory and share the PCM with STT and features
+                    raw = _decode_to_pcm(audio_path)
+                    audio_data = sr.AudioData(raw, AUDIO_SAMPLE_RATE, 2)
+                    if LIBROSA_AVAILABLE:
+                        import numpy as np
+                        samples = np.frombuffer(raw, dtype=np.int16).astype(np.float32) / 32768.0
+                else:
+                    with sr.AudioFile(audio_path) as source:
+                        audio_data = recognizer.record(source)
+                
+                # Transcribe (network) while analyzing features (CPU, NumPy releases the GIL)
+                with ThreadPoolExecutor(max_workers=2) as executor:
+                    stt_future = executor.submit(recognizer.recognize_google, audio_data)
+                    features_future = executor.submit(analyze_audio_features, audio_path, samples, digest)
+                    transcript = stt_future.result()
+                    audio_features = features_future.result()
                 text = transcript
-            
-            # Analyze features
-            audio_features = analyze_audio_features(audio_path)
+                if audio_features.get("status") == "success":
+                    _write_audio_cache(digest, transcript, audio_features)
             
         except sr.UnknownValueError:
             return {"status": "error", "message": "Could not understand audio"}
@@ -376,24 +611,13 @@ def analyze_interpersonal(
             "options": ["Type: 'Analyze: [your message]'", "Upload audio (WAV/MP3)"]
         }
     
-    lower = text.lower()
-    
-    # Pattern detection
+    # Pattern detection (case-insensitive, no lowercased copy needed)
     analysis = {"style": "neutral", "tone_score": 6, "issues": [], "strengths": []}
     
-    aggressive_patterns = [
-        (r"\byou always\b", "Absolute blame"),
-        (r"\byou never\b", "Absolute blame"),
-        (r"\byou should\b", "Commanding tone"),
-    ]
-    
-    assertive_patterns = [
-        (r"\bi feel\b.*\bwhen\b", "✅ Great 'I feel when' statement!"),
-        (r"\bi think\b", "✅ Owning your opinion"),
-    ]
-    
-    aggressive_count = sum(1 for p, _ in aggressive_patterns if re.search(p, lower))
-    assertive_count = sum(1 for p, _ in assertive_patterns if re.search(p, lower))
+    matched = {m.lastgroup for m in COMMUNICATION_RE.finditer(text)}
+    categories = [COMMUNICATION_GROUPS[group][0] for group in matched]
+    aggressive_count = categories.count("aggressive")
+    assertive_count = categories.count("assertive")
     
     if aggressive_count >= 2:
         analysis["style"] = "❌ AGGRESSIVE"
@@ -403,15 +627,11 @@ def analyze_interpersonal(
         analysis["tone_score"] = 8
     
     # Coaching
-    coaching = []
-    if "AGGRESSIVE" in analysis["style"]:
-        coaching = ["Replace 'you always' with 'when this happens, I feel...'"]
-    else:
-        coaching = [f"Great work, {user.name}!"]
+    templates = AGGRESSIVE_COACHING if "AGGRESSIVE" in analysis["style"] else POSITIVE_COACHING
+    coaching = [line.format(name=user.name) for line in templates]
     
     user.total_points += 15
-    metric_inc("communication_analyses")
-    metric_time("interpersonal_coach", time.time() - start)
+    metric_record("communication_analyses", "interpersonal_coach", time.perf_counter() - start)
     
     return {
         "status": "analyzed",
@@ -426,21 +646,34 @@ def analyze_interpersonal(
 # AGENT 4 - MEAL PLANNER
 # ============================================================================
 
+# Lists accept ',' or ';'; translate then str.split avoids the regex engine
+LIST_SEPARATORS = str.maketrans(";", ",")
+
+FOOD_IMAGE_PROMPT = "List all food items visible. Return comma-separated list or 'none'."
+
+
+@functools.lru_cache(maxsize=4)
+def _get_model(name: str):
+    """Build a Gemini model once per name and reuse it across calls."""
+    import google.generativeai as genai
+    
+    return genai.GenerativeModel(name)
+
+
 def analyze_food_image(image_path: str) -> Dict:
     """Use Gemini Vision to detect food items."""
     if not GENAI_AVAILABLE:
         return {"status": "error", "message": "Gemini not available", "items": []}
     
     try:
+        from PIL import Image
+        
         image = Image.open(image_path)
         image.verify()
         image = Image.open(image_path)
         
-        model = genai.GenerativeModel('gemini-2.0-flash-exp')
-        response = model.generate_content([
-            "List all food items visible. Return comma-separated list or 'none'.",
-            image
-        ])
+        model = _get_model('gemini-2.0-flash-exp')
+        response = model.generate_content([FOOD_IMAGE_PROMPT, image])
         
         result_text = response.text.strip().lower()
         if result_text == "none":
@@ -471,7 +704,7 @@ def plan_meals(
     
     Returns: Meal plans with recipes
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
     groceries = []
     
@@ -483,10 +716,11 @@ def plan_meals(
     
     # Process text
     if ingredients:
-        items = [g.strip().lower() for g in re.split(r'[,;]', ingredients) if len(g.strip()) > 2]
+        items = [g for g in (g.strip().lower() for g in ingredients.translate(LIST_SEPARATORS).split(',')) if len(g) > 2]
         groceries.extend(items)
     
-    groceries = list(set(groceries))
+    # Dedupe but keep input order so the "main" ingredient is the first given
+    groceries = list(dict.fromkeys(groceries))
     
     if not groceries:
         return {
@@ -499,19 +733,23 @@ def plan_meals(
     meal_plans = []
     days = min(max(1, days), 7)
     
+    # groceries is non-empty here; format the dish names once, not per day
+    main = groceries[0]
+    breakfast = f"Eggs with {main}"
+    lunch = f"Grilled {main} salad"
+    
     for day in range(1, days + 1):
         meal_plans.append({
             "day": f"Day {day}",
             "meals": {
-                "breakfast": {"dish": f"Eggs with {groceries[0] if groceries else 'vegetables'}", "time": "15 min"},
-                "lunch": {"dish": f"Grilled {groceries[0]} salad", "time": "20 min"},
-                "dinner": {"dish": f"Stir-fry with rice", "time": "30 min"}
+                "breakfast": {"dish": breakfast, "time": "15 min"},
+                "lunch": {"dish": lunch, "time": "20 min"},
+                "dinner": {"dish": "Stir-fry with rice", "time": "30 min"}
             }
         })
     
     user.total_points += 25
-    metric_inc("meal_plans")
-    metric_time("meal_planner", time.time() - start)
+    metric_record("meal_plans", "meal_planner", time.perf_counter() - start)
     
     return {
         "status": "complete",
@@ -526,6 +764,11 @@ def plan_meals(
 # AGENT 5 - TASK PLANNER
 # ============================================================================
 
+# Whole words that bump a task's priority ("unimportant" no longer counts)
+URGENT_WORDS = frozenset({"urgent", "urgently", "important", "asap"})
+WORD_RE = re.compile(r"[a-z]+")
+
+
 def plan_tasks(user_id: str, tasks_text: str) -> Dict:
     """
     Organize and prioritize tasks.
@@ -536,10 +779,10 @@ def plan_tasks(user_id: str, tasks_text: str) -> Dict:
     
     Returns: Prioritized task list
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
     
-    tasks = [t.strip() for t in re.split(r'[,;]', tasks_text) if len(t.strip()) > 2]
+    tasks = [t for t in (t.strip() for t in tasks_text.translate(LIST_SEPARATORS).split(',')) if len(t) > 2]
     
     if not tasks:
         return {
@@ -555,7 +798,7 @@ def plan_tasks(user_id: str, tasks_text: str) -> Dict:
         est = 30  # default minutes
         priority = 10 - i
         
-        if any(w in task.lower() for w in ["urgent", "important"]):
+        if not URGENT_WORDS.isdisjoint(WORD_RE.findall(task.lower())):
             priority += 5
         
         scheduled.append({
@@ -569,8 +812,7 @@ def plan_tasks(user_id: str, tasks_text: str) -> Dict:
     scheduled.sort(key=lambda x: x["priority"], reverse=True)
     
     user.total_points += 15
-    metric_inc("tasks_planned")
-    metric_time("task_planner", time.time() - start)
+    metric_record("tasks_planned", "task_planner", time.perf_counter() - start)
     
     return {
         "status": "planned",
@@ -588,6 +830,38 @@ def plan_tasks(user_id: str, tasks_text: str) -> Dict:
 # AGENT 6 - NUTRITION ADVISOR
 # ============================================================================
 
+ADVICE_DB = {
+    "stress": {
+        "keywords": ("stress", "anxiety", "calm"),
+        "goal_name": "Stress Management",
+        "foods": ("Dark chocolate", "Walnuts", "Salmon", "Green tea"),
+        "tips": ("🍫 Magnesium reduces cortisol", "🐟 Omega-3s reduce anxiety")
+    },
+    "energy": {
+        "keywords": ("energy", "tired", "fatigue"),
+        "goal_name": "Energy Boost",
+        "foods": ("Oatmeal", "Eggs", "Bananas", "Almonds"),
+        "tips": ("🥚 Protein sustains energy", "💧 Drink more water!")
+    }
+}
+
+DEFAULT_ADVICE = {
+    "goal_name": "General Wellness",
+    "foods": ("Vegetables", "Lean proteins", "Whole grains"),
+    "tips": ("🌈 Eat the rainbow", "💧 Stay hydrated")
+}
+
+# Keyword -> (goal rank, advice); the earliest goal in ADVICE_DB wins
+ADVICE_KEYWORDS = {
+    kw.lower(): (rank, data)
+    for rank, data in enumerate(ADVICE_DB.values())
+    for kw in data["keywords"]
+}
+
+# Substring match like the original `kw in goal`, all keywords in one scan
+ADVICE_RE = re.compile("|".join(map(re.escape, sorted(ADVICE_KEYWORDS, key=len, reverse=True))), re.I)
+
+
 def get_nutrition_advice(user_id: str, goal: str) -> Dict:
     """
     Provide nutrition advice based on goals.
@@ -598,47 +872,20 @@ def get_nutrition_advice(user_id: str, goal: str) -> Dict:
     
     Returns: Personalized nutrition guidance
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
-    lower = goal.lower()
-    
-    advice_db = {
-        "stress": {
-            "keywords": ["stress", "anxiety", "calm"],
-            "goal_name": "Stress Management",
-            "foods": ["Dark chocolate", "Walnuts", "Salmon", "Green tea"],
-            "tips": ["🍫 Magnesium reduces cortisol", "🐟 Omega-3s reduce anxiety"]
-        },
-        "energy": {
-            "keywords": ["energy", "tired", "fatigue"],
-            "goal_name": "Energy Boost",
-            "foods": ["Oatmeal", "Eggs", "Bananas", "Almonds"],
-            "tips": ["🥚 Protein sustains energy", "💧 Drink more water!"]
-        }
-    }
     
-    selected = None
-    for key, data in advice_db.items():
-        if any(kw in lower for kw in data["keywords"]):
-            selected = data
-            break
-    
-    if not selected:
-        selected = {
-            "goal_name": "General Wellness",
-            "foods": ["Vegetables", "Lean proteins", "Whole grains"],
-            "tips": ["🌈 Eat the rainbow", "💧 Stay hydrated"]
-        }
+    hits = [ADVICE_KEYWORDS[m.group().lower()] for m in ADVICE_RE.finditer(goal)]
+    selected = min(hits, key=lambda hit: hit[0])[1] if hits else DEFAULT_ADVICE
     
     user.total_points += 10
-    metric_inc("nutrition_advice")
-    metric_time("nutrition_agent", time.time() - start)
+    metric_record("nutrition_advice", "nutrition_agent", time.perf_counter() - start)
     
     return {
         "status": "success",
         "goal": selected["goal_name"],
-        "recommended_foods": selected["foods"],
-        "tips": selected["tips"],
+        "recommended_foods": list(selected["foods"]),
+        "tips": list(selected["tips"]),
         "stats": {"points_earned": 10, "total_points": user.total_points}
     }
 
@@ -647,24 +894,64 @@ def get_nutrition_advice(user_id: str, goal: str) -> Dict:
 # AGENT 7 - SUMMARIZER
 # ============================================================================
 
+# Characters of extracted text kept for summarizing
+MAX_CONTENT_CHARS = 15000
+
+REQUEST_HEADERS = {'User-Agent': 'Mozilla/5.0'}
+
+# lxml parses in C; html.parser is the pure-Python fallback
+HTML_PARSER = "lxml" if find_spec("lxml") is not None else "html.parser"
+TEXT_TAGS = ['p', 'h1', 'h2']
+
+# Only MAX_CONTENT_CHARS of text are kept, so stop downloading well before that
+MAX_HTML_BYTES = 256 * 1024
+
+
+@functools.cache
+def _http_session():
+    """Shared keep-alive session so repeat hosts skip DNS and TLS setup."""
+    import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
+    
+    session = requests.Session()
+    session.headers.update(REQUEST_HEADERS)
+    adapter = HTTPAdapter(
+        pool_connections=10,
+        pool_maxsize=10,
+        max_retries=Retry(total=2, backoff_factor=0.3)
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
 def extract_from_url(url: str) -> Dict:
     """Extract text from URL."""
     if not WEB_SCRAPING_AVAILABLE:
         return {"status": "error", "message": "requests/BeautifulSoup not available"}
     
     try:
-        headers = {'User-Agent': 'Mozilla/5.0'}
-        response = requests.get(url, headers=headers, timeout=15)
-        response.raise_for_status()
+        from bs4 import BeautifulSoup, SoupStrainer
+        
+        with _http_session().get(url, timeout=15, stream=True) as response:
+            response.raise_for_status()
+            
+            html = bytearray()
+            for chunk in response.iter_content(chunk_size=64 * 1024):
+                html += chunk
+                if len(html) >= MAX_HTML_BYTES:
+                    break
         
-        soup = BeautifulSoup(response.content, 'html.parser')
-        paragraphs = soup.find_all(['p', 'h1', 'h2'])
-        text = '\n'.join([p.get_text().strip() for p in paragraphs if p.get_text().strip()])
+        # Only build tree nodes for the text tags we keep
+        soup = BeautifulSoup(bytes(html[:MAX_HTML_BYTES]), HTML_PARSER, parse_only=SoupStrainer(TEXT_TAGS))
+        paragraphs = soup.find_all(TEXT_TAGS)
+        text = '\n'.join(t for t in (p.get_text(" ", strip=True) for p in paragraphs) if t)
         
         return {
             "status": "success",
             "type": "url",
-            "content": text[:15000],
+            "content": text[:MAX_CONTENT_CHARS],
             "word_count": len(text.split())
         }
     except Exception as e:
@@ -681,22 +968,67 @@ def extract_from_pdf(pdf_path: str) -> Dict:
         if validation["status"] == "error":
             return {"status": "error", "message": validation["error"]}
         
-        text = ""
-        with open(pdf_path, 'rb') as f:
-            reader = PdfReader(f)
-            for page in reader.pages[:50]:
-                text += page.extract_text() + "\n"
+        # Only MAX_CONTENT_CHARS are kept, so stop extracting pages once we have them
+        chunks = []
+        total = 0
+        if FITZ_AVAILABLE:
+            import fitz
+            
+            with fitz.open(pdf_path) as doc:
+                for page in doc.pages(0, min(MAX_PDF_PAGES, doc.page_count)):
+                    page_text = page.get_text("text")
+                    if page_text:
+                        chunks.append(page_text)
+                        total += len(page_text)
+                        if total >= MAX_CONTENT_CHARS:
+                            break
+        else:
+            try:
+                from pypdf import PdfReader
+            except ImportError:
+                from PyPDF2 import PdfReader
+            
+            with open(pdf_path, 'rb') as f:
+                reader = PdfReader(f)
+                for page in reader.pages[:MAX_PDF_PAGES]:
+                    page_text = page.extract_text()
+                    if page_text:
+                        chunks.append(page_text)
+                        total += len(page_text)
+                        if total >= MAX_CONTENT_CHARS:
+                            break
+        text = "\n".join(chunks)
         
         return {
             "status": "success",
             "type": "pdf",
-            "content": text[:15000],
+            "content": text[:MAX_CONTENT_CHARS],
             "word_count": len(text.split())
         }
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
 
+# Split after ., ! or ? followed by whitespace; surrounding whitespace is consumed
+SENTENCE_BOUNDARY_RE = re.compile(r"(?<=[.!?])\s+")
+
+
+def _merge_extracted(*results: Dict) -> Dict:
+    """Combine successful extractions into one source; return the first error if none succeeded."""
+    ok = [r for r in results if r.get("status") == "success"]
+    if not ok:
+        return results[0]
+    if len(ok) == 1:
+        return ok[0]
+    
+    return {
+        "status": "success",
+        "type": "+".join(r["type"] for r in ok),
+        "content": "\n\n".join(r["content"] for r in ok),
+        "word_count": sum(r.get("word_count", 0) for r in ok)
+    }
+
+
 def summarize_content(
     user_id: str,
     text: Optional[str] = None,
@@ -716,12 +1048,18 @@ def summarize_content(
     
     Returns: Analysis with insights
     """
-    start = time.time()
+    start = time.perf_counter()
     user = get_user(user_id)
     
     extracted = None
     
-    if url:
+    if url and pdf_path:
+        # Network fetch and PDF parsing are independent; overlap them
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            url_future = executor.submit(extract_from_url, url)
+            pdf_future = executor.submit(extract_from_pdf, pdf_path)
+            extracted = _merge_extracted(url_future.result(), pdf_future.result())
+    elif url:
         extracted = extract_from_url(url)
     elif pdf_path:
         extracted = extract_from_pdf(pdf_path)
@@ -741,12 +1079,11 @@ def summarize_content(
     word_count = extracted.get("word_count", 0)
     
     # Simple extractive summary
-    sentences = [s.strip() for s in content.split('.') if len(s.strip()) > 20]
-    summary = '. '.join(sentences[:3]) + '.'
+    sentences = [s for s in SENTENCE_BOUNDARY_RE.split(content.strip()) if len(s) > 20]
+    summary = ' '.join(sentences[:3])
     
     user.total_points += 30
-    metric_inc("summaries")
-    metric_time("summarizer", time.time() - start)
+    metric_record("summaries", "summarizer", time.perf_counter() - start)
     
     return {
         "status": "complete",
@@ -0,0 +1,76 @@
+"""Gemini Batch Mode helpers for offline evaluation runs."""
+
+import time
+from typing import Dict, List
+
+from .config import logger, GOOGLE_API_KEY, BATCH_POLL_INTERVAL_SEC, BATCH_MAX_WAIT_SEC
+
+try:
+    from google import genai
+    GENAI_CLIENT_AVAILABLE = True
+except ImportError:
+    GENAI_CLIENT_AVAILABLE = False
+    logger.warning("google-genai not available - batch mode disabled")
+
+COMPLETED_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
+
+def submit_inline_batch(
+    requests: List[Dict],
+    model: str = "gemini-2.5-flash",
+    max_wait_sec: float = BATCH_MAX_WAIT_SEC
+) -> List[Dict]:
+    """
+    Submit prompts as a single inline Gemini batch job and wait for results.
+
+    Batch jobs are billed at the discounted batch rate but are not realtime,
+    so only use this for evaluations - never for interactive chat.
+
+    Parameters:
+    - requests: Inline GenerateContentRequest dicts, e.g.
+      {"contents": [{"role": "user", "parts": [{"text": "..."}]}]}
+    - model: Gemini model identifier
+    - max_wait_sec: Give up (and cancel the job) if it has not finished by then
+
+    Returns: One dict per request, in input order, with status and text or error
+    """
+    if not GENAI_CLIENT_AVAILABLE:
+        return [{"status": "error", "error": "google-genai not available"} for _ in requests]
+
+    if not requests:
+        return []
+
+    client = genai.Client(api_key=GOOGLE_API_KEY)
+    job = client.batches.create(
+        model=model,
+        src=requests,
+        config={"display_name": f"mindmate-eval-{int(time.time())}"},
+    )
+    logger.info(f"Submitted batch job {job.name} with {len(requests)} requests")
+
+    deadline = time.monotonic() + max_wait_sec
+    while job.state.name not in COMPLETED_STATES:
+        if time.monotonic() >= deadline:
+            logger.error(f"Batch job {job.name} still {job.state.name} after {max_wait_sec}s - cancelling")
+            client.batches.cancel(name=job.name)
+            return [{"status": "error", "error": "timeout"} for _ in requests]
+        time.sleep(BATCH_POLL_INTERVAL_SEC)
+        job = client.batches.get(name=job.name)
+
+    if job.state.name != "JOB_STATE_SUCCEEDED":
+        logger.error(f"Batch job {job.name} finished with state {job.state.name}")
+        return [{"status": "error", "error": job.state.name} for _ in requests]
+
+    results = []
+    for inline in job.dest.inlined_responses:
+        if inline.response:
+            results.append({"status": "success", "text": inline.response.text})
+        else:
+            results.append({"status": "error", "error": str(inline.error)})
+
+    return results
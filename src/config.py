@@ -2,6 +2,7 @@
 
 import logging
 import os
+import tempfile
 from pathlib import Path
 
 # Setup logging
@@ -56,4 +57,21 @@ MAX_FILE_SIZE_MB = 50
 MAX_AUDIO_DURATION_SEC = 300
 MAX_PDF_PAGES = 50
 
+# Audio analysis: speech features need nothing above 8 kHz
+AUDIO_SAMPLE_RATE = 16000
+AUDIO_RESAMPLE_TYPE = "soxr_qq"
+
+# Persistent audio cache holds speech transcripts, so it is opt-in and kept out of the repo
+AUDIO_DISK_CACHE_ENABLED = os.getenv("MINDMATE_AUDIO_DISK_CACHE", "0") == "1"
+AUDIO_CACHE_DIR = Path(os.getenv("MINDMATE_AUDIO_CACHE_DIR", Path(tempfile.gettempdir()) / "mindmate_audio_cache"))
+AUDIO_CACHE_MAX_ENTRIES = 64
+AUDIO_CACHE_TTL_SEC = 24 * 60 * 60
+
+# Concurrency
+MAX_CONCURRENCY = int(os.getenv("MINDMATE_MAX_CONCURRENCY", "4"))
+
+# Batch mode
+BATCH_POLL_INTERVAL_SEC = 30
+BATCH_MAX_WAIT_SEC = 24 * 60 * 60
+
 logger.info("✅ MindMate AI configuration loaded")
@@ -0,0 +1,48 @@
+"""ADK tool definitions for the 7 MindMate agents."""
+
+import functools
+
+from .utils import safe_tool_wrapper, async_tool_wrapper
+from .agents import (
+    analyze_mood,
+    play_stress_game,
+    analyze_interpersonal,
+    plan_meals,
+    plan_tasks,
+    get_nutrition_advice,
+    summarize_content,
+)
+
+# Wrap all agent functions with error handling
+wrapped_analyze_mood = safe_tool_wrapper(analyze_mood)
+wrapped_play_stress_game = safe_tool_wrapper(play_stress_game)
+wrapped_analyze_interpersonal = safe_tool_wrapper(analyze_interpersonal)
+wrapped_plan_meals = safe_tool_wrapper(plan_meals)
+wrapped_plan_tasks = safe_tool_wrapper(plan_tasks)
+wrapped_get_nutrition_advice = safe_tool_wrapper(get_nutrition_advice)
+wrapped_summarize_content = safe_tool_wrapper(summarize_content)
+
+
+@functools.cache
+def all_tools() -> tuple:
+    """
+    Build the ADK FunctionTools once.
+    
+    FunctionTool derives each tool's schema from the function signature,
+    so the list is cached and shared by every agent that needs it.
+    """
+    from google.adk.tools import FunctionTool
+    
+    # Async adapters let ADK run independent tool calls from one turn concurrently
+    return tuple(
+        FunctionTool(async_tool_wrapper(func))
+        for func in (
+            wrapped_analyze_mood,
+            wrapped_play_stress_game,
+            wrapped_analyze_interpersonal,
+            wrapped_plan_meals,
+            wrapped_plan_tasks,
+            wrapped_get_nutrition_advice,
+            wrapped_summarize_content,
+        )
+    )
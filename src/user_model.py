@@ -1,11 +1,16 @@
 """User data model and management."""
 
+from collections import deque
 from dataclasses import dataclass, field
-from typing import List, Dict
+from typing import List, Dict, Deque
+import threading
 import time
 
+# Number of recent check-ins kept per user
+HISTORY_LIMIT = 20
 
-@dataclass
+
+@dataclass(slots=True)
 class UserJourney:
     """Tracks individual user's wellness journey."""
     user_id: str
@@ -14,10 +19,12 @@ class UserJourney:
     level: int = 1
     badges: List[str] = field(default_factory=list)
     streaks: Dict[str, int] = field(default_factory=dict)
-    emotion_history: List[Dict] = field(default_factory=list)
-    stress_history: List[int] = field(default_factory=list)
+    emotion_history: Deque[Dict] = field(default_factory=lambda: deque(maxlen=HISTORY_LIMIT))
+    stress_history: Deque[int] = field(default_factory=lambda: deque(maxlen=HISTORY_LIMIT))
+    score_history: Deque[int] = field(default_factory=lambda: deque(maxlen=HISTORY_LIMIT))
     communication_history: List[Dict] = field(default_factory=list)
-    game_scores: Dict = field(default_factory=dict)
+    recent_game_types: Deque[str] = field(default_factory=lambda: deque(maxlen=2))
+    total_games_played: int = 0
     created_at: float = field(default_factory=time.time)
     last_active: float = field(default_factory=time.time)
 
@@ -25,16 +32,23 @@ class UserJourney:
 # Global user storage
 user_journeys: Dict[str, UserJourney] = {}
 
+# Tools run in worker threads; this guards creating profiles and per-user locks
+_users_lock = threading.Lock()
+_user_locks: Dict[str, threading.Lock] = {}
+
 
 def get_user(user_id: str) -> UserJourney:
     """Get or create user profile."""
-    if user_id not in user_journeys:
-        user_journeys[user_id] = UserJourney(
-            user_id=user_id,
-            name=user_id.split('_')[0].title() if '_' in user_id else user_id.title()
-        )
+    user = user_journeys.get(user_id)
+    if user is None:
+        with _users_lock:
+            user = user_journeys.get(user_id)
+            if user is None:
+                user = user_journeys[user_id] = UserJourney(
+                    user_id=user_id,
+                    name=user_id.split('_')[0].title() if '_' in user_id else user_id.title()
+                )
     
-    user = user_journeys[user_id]
     user.last_active = time.time()
     
     # Level up logic
@@ -46,10 +60,23 @@ def get_user(user_id: str) -> UserJourney:
     return user
 
 
+def user_lock(user_id: str) -> threading.Lock:
+    """Lock that serializes tool calls mutating one user's journey."""
+    lock = _user_locks.get(user_id)
+    if lock is None:
+        with _users_lock:
+            lock = _user_locks.setdefault(user_id, threading.Lock())
+    return lock
+
+
 def get_greeting(user_id: str) -> str:
     """Get personalized greeting based on time and user history."""
-    user = get_user(user_id)
-    hour = int(time.strftime("%H"))
+    return format_greeting(get_user(user_id))
+
+
+def format_greeting(user: UserJourney) -> str:
+    """Build the time-of-day greeting for an already loaded user."""
+    hour = time.localtime().tm_hour
     
     if hour < 12:
         time_greeting = "Good morning"
@@ -73,6 +100,6 @@ def get_user_stats(user_id: str) -> Dict:
         "badges": user.badges,
         "streaks": user.streaks,
         "total_moods_tracked": len(user.emotion_history),
-        "total_games_played": user.game_scores.get("total_played", 0),
+        "total_games_played": user.total_games_played,
         "member_since": time.strftime("%Y-%m-%d", time.localtime(user.created_at))
     }
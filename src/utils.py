@@ -1,45 +1,60 @@
 """Utility functions for Mindmate AI."""
 
 import os
+import stat
+import asyncio
+import hashlib
 import functools
+import threading
 import traceback
+from collections import Counter, defaultdict
 from typing import Callable, Dict, Any, List
-from .config import logger
+from .config import logger, MAX_FILE_SIZE_MB
+from .user_model import user_lock
 
 # Simple metrics storage
 metrics = {
-    "counters": {},
-    "timers": {}
+    "counters": Counter(),
+    "timers": defaultdict(list)
 }
 
+# Agents record metrics from concurrent tool threads
+_metrics_lock = threading.Lock()
+
 
 def metric_inc(name: str, value: int = 1):
     """Increment a counter metric."""
-    if name not in metrics["counters"]:
-        metrics["counters"][name] = 0
-    metrics["counters"][name] += value
+    with _metrics_lock:
+        metrics["counters"][name] += value
 
 
 def metric_time(name: str, duration: float):
-    """Record a timing metric."""
-    if name not in metrics["timers"]:
-        metrics["timers"][name] = []
-    metrics["timers"][name].append(duration)
+    """Record a timing metric (seconds, from time.perf_counter)."""
+    with _metrics_lock:
+        metrics["timers"][name].append(duration)
+
+
+def metric_record(counter_name: str, timer_name: str, duration: float):
+    """Count one agent call and record its duration in a single call."""
+    with _metrics_lock:
+        metrics["counters"][counter_name] += 1
+        metrics["timers"][timer_name].append(duration)
 
 
 def get_metrics() -> Dict:
     """Get all collected metrics."""
-    return {
-        "counters": metrics["counters"],
-        "timers": {
-            k: {
-                "count": len(v),
-                "avg": sum(v) / len(v) if v else 0,
-                "total": sum(v)
+    with _metrics_lock:
+        return {
+            "counters": dict(metrics["counters"]),
+            "timers": {
+                k: {
+                    "count": len(v),
+                    "avg": sum(v) / len(v) if v else 0,
+                    "total": sum(v)
+                }
+                for k, v in metrics["timers"].items()
             }
-            for k, v in metrics["timers"].items()
         }
-    }
 
 
 def safe_file_read(file_path: str, allowed_extensions: List[str]) -> Dict:
@@ -61,27 +76,35 @@ def safe_file_read(file_path: str, allowed_extensions: List[str]) -> Dict:
                 "error": f"Unsupported file type: {file_ext}. Allowed: {', '.join(allowed_extensions)}"
             }
         
-        # Check if file exists
-        if not os.path.exists(file_path):
+        # Single stat call for existence, type and size
+        try:
+            st = os.stat(file_path)
+        except FileNotFoundError:
             return {
                 "status": "error",
                 "error": f"File not found: {file_path}"
             }
         
+        if not stat.S_ISREG(st.st_mode):
+            return {
+                "status": "error",
+                "error": f"Not a regular file: {file_path}"
+            }
+        
         # Check if file is empty
-        if os.path.getsize(file_path) == 0:
+        if st.st_size == 0:
             return {
                 "status": "error",
                 "error": "File is empty"
             }
         
-        # Check file size (50MB limit)
-        max_size = 50 * 1024 * 1024
-        if os.path.getsize(file_path) > max_size:
-            size_mb = os.path.getsize(file_path) / (1024 * 1024)
+        # Check file size
+        max_size = MAX_FILE_SIZE_MB * 1024 * 1024
+        if st.st_size > max_size:
+            size_mb = st.st_size / (1024 * 1024)
             return {
                 "status": "error",
-                "error": f"File too large ({size_mb:.1f}MB). Maximum: 50MB"
+                "error": f"File too large ({size_mb:.1f}MB). Maximum: {MAX_FILE_SIZE_MB}MB"
             }
         
         return {"status": "success"}
@@ -94,6 +117,15 @@ def safe_file_read(file_path: str, allowed_extensions: List[str]) -> Dict:
         }
 
 
+def file_digest(file_path: str) -> str:
+    """Return a short BLAKE2b hex digest of a file's contents (for cache keys)."""
+    h = hashlib.blake2b(digest_size=16)
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
 def safe_tool_wrapper(func: Callable) -> Callable:
     """
     Wraps agent functions with error handling.
@@ -101,25 +133,52 @@ def safe_tool_wrapper(func: Callable) -> Callable:
     Usage:
         wrapped_function = safe_tool_wrapper(original_function)
     """
+    agent_name = func.__name__
+    user_message = f"Sorry, I encountered an issue with {agent_name.replace('_', ' ')}. Please try again or rephrase your request."
+    
     @functools.wraps(func)
     def wrapper(*args, **kwargs) -> Dict[str, Any]:
         try:
-            result = func(*args, **kwargs)
-            return result
+            return func(*args, **kwargs)
         except Exception as e:
-            error_msg = f"Error in {func.__name__}: {str(e)}"
-            logger.error(f"{error_msg}\n{traceback.format_exc()}")
+            logger.error(f"Error in {agent_name}: {str(e)}\n{traceback.format_exc()}")
             
             return {
                 "status": "error",
-                "agent": func.__name__,
+                "agent": agent_name,
                 "error_message": str(e),
-                "user_message": f"Sorry, I encountered an issue with {func.__name__.replace('_', ' ')}. Please try again or rephrase your request."
+                "user_message": user_message
             }
     
     return wrapper
 
 
+def async_tool_wrapper(func: Callable) -> Callable:
+    """
+    Expose a blocking agent function as a coroutine.
+    
+    The call runs in a worker thread, so when the model requests several
+    independent tools in one turn ADK can await them concurrently instead
+    of blocking the event loop on each in turn. Calls for the same user
+    are serialized, since every agent updates that user's journey.
+    
+    Usage:
+        tool = FunctionTool(async_tool_wrapper(safe_tool_wrapper(original_function)))
+    """
+    def locked_call(*args, **kwargs):
+        user_id = kwargs.get("user_id", args[0] if args else None)
+        if user_id is None:
+            return func(*args, **kwargs)
+        with user_lock(user_id):
+            return func(*args, **kwargs)
+    
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs) -> Dict[str, Any]:
+        return await asyncio.to_thread(locked_call, *args, **kwargs)
+    
+    return wrapper
+
+
 def format_response(data: Dict) -> str:
     """
     Format agent response data into readable text.
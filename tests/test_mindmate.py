@@ -6,6 +6,7 @@ Run with: pytest tests/test_mindmate.py -v -s
 
 import os
 import sys
+import asyncio
 import pytest
 import pytest_asyncio
 
@@ -269,6 +270,500 @@ async def test_agent_integration(test_session):
     assert response_found, "No response received from agent"
 
 
+# Direct agent calls (no LLM): (label, function name, kwargs)
+AGENT_SMOKE_CASES = (
+    ("Mood Agent", "analyze_mood", {"user_id": "smoke_mood", "message": "I'm feeling stressed about work", "stress_level": 7}),
+    ("Stress Buster", "play_stress_game", {"user_id": "smoke_game", "game_type": "riddle"}),
+    ("Interpersonal Coach", "analyze_interpersonal", {"user_id": "smoke_coach", "text": "You never listen to me"}),
+    ("Meal Planner", "plan_meals", {"user_id": "smoke_meal", "ingredients": "chicken, rice, broccoli", "days": 3}),
+    ("Task Planner", "plan_tasks", {"user_id": "smoke_task", "tasks_text": "finish report, call clients, workout"}),
+    ("Nutrition Advisor", "get_nutrition_advice", {"user_id": "smoke_food", "goal": "more energy"}),
+    ("Summarizer", "summarize_content", {"user_id": "smoke_sum", "text": "AI is transforming healthcare with 95% accuracy in cancer detection. Deep learning models analyze medical images faster than human doctors."}),
+)
+
+
+@pytest.mark.asyncio
+async def test_agents_direct_concurrent():
+    """Run all 7 agent functions directly and concurrently."""
+    print("\n" + "="*70)
+    print("[DIRECT TEST] All agents without the LLM")
+    print("="*70)
+    
+    from src import agents
+    
+    results = await asyncio.gather(*[
+        asyncio.to_thread(getattr(agents, func_name), **kwargs)
+        for _, func_name, kwargs in AGENT_SMOKE_CASES
+    ])
+    
+    for (label, _, _), result in zip(AGENT_SMOKE_CASES, results):
+        print(f"{label}: {str(result)[:100]}...")
+        assert isinstance(result, dict)
+        assert result.get("status") not in ("error", "needs_input"), f"{label} failed: {result}"
+
+
+# Mood messages and the emotion they must map to (no LLM)
+MOOD_CASES = (
+    ("drowning in hopelessness", "distressed"),
+    ("I'm panicking", "anxious"),
+    ("so much sadness", "sad"),
+    ("I'm sad but the weather is great", "sad"),
+    ("Feeling great, best day ever", "very_positive"),
+    ("Just a normal day", "neutral"),
+)
+
+
+def test_mood_emotion_detection():
+    """Inflected keywords still match and the most severe emotion wins."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Mood emotion detection")
+    print("="*70)
+    
+    from src import analyze_mood
+    
+    for message, expected in MOOD_CASES:
+        result = analyze_mood("test_mood_emotion", message)
+        assert result["emotion"] == expected, f"{message!r} -> {result['emotion']}"
+
+
+TREND_CASES = (
+    (("so much sadness", "Just a normal day", "Feeling great, best day ever"), "improving 📈"),
+    (("Feeling great, best day ever", "Just a normal day", "drowning in hopelessness"), "declining 📉"),
+    (("Just a normal day", "Just a normal day", "Just a normal day"), "stable ➡️"),
+)
+
+
+def test_mood_trend():
+    """Trend needs three scores and follows the slope of the history."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Mood trend")
+    print("="*70)
+    
+    from src import analyze_mood
+    
+    for i, (messages, expected) in enumerate(TREND_CASES):
+        user_id = f"test_mood_trend_{i}"
+        first, second, third = messages
+        assert analyze_mood(user_id, first)["trend"] == "not enough data"
+        assert analyze_mood(user_id, second)["trend"] == "not enough data"
+        result = analyze_mood(user_id, third)
+        assert result["trend"] == expected, f"{messages!r} -> {result['trend']}"
+        assert result["trend_slope"] is not None
+
+
+COMMUNICATION_CASES = (
+    ("You always ignore me and you never listen", "❌ AGGRESSIVE"),
+    ("YOU ALWAYS do this, You Never help", "❌ AGGRESSIVE"),
+    ("You always forget", "neutral"),
+    ("I feel hurt when you leave early", "✅ ASSERTIVE"),
+    ("I feel tired", "neutral"),
+    ("I think we should talk", "✅ ASSERTIVE"),
+    ("Everything is fine", "neutral"),
+)
+
+
+def test_communication_style():
+    """The fused pattern classifies tone case-insensitively."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Communication style")
+    print("="*70)
+    
+    from src import analyze_interpersonal
+    
+    for text, expected in COMMUNICATION_CASES:
+        result = analyze_interpersonal("test_communication_style", text=text)
+        assert result["analysis"]["style"] == expected, f"{text!r} -> {result['analysis']['style']}"
+
+
+URGENCY_CASES = (
+    ("URGENT call client", "urgent"),
+    ("reply asap", "urgent"),
+    ("important email", "urgent"),
+    ("unimportant chores", "normal"),
+    ("finish report", "normal"),
+)
+
+
+def test_task_urgency():
+    """Urgency keywords match whole words in any case."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Task urgency")
+    print("="*70)
+    
+    from src import plan_tasks
+    
+    for task, expected in URGENCY_CASES:
+        result = plan_tasks("test_task_urgency", task)
+        assert result["tasks"][0]["category"] == expected, f"{task!r} -> {result['tasks'][0]['category']}"
+
+
+SUMMARY_TEXT = (
+    "Models now run 2.5x faster on the same hardware. "
+    "Can they be trusted in clinics yet? "
+    "Validation studies are still underway!   "
+    "Short one. "
+    "Regulators expect results by next year."
+)
+
+SUMMARY_KEY_POINTS = [
+    "Models now run 2.5x faster on the same hardware.",
+    "Can they be trusted in clinics yet?",
+    "Validation studies are still underway!",
+    "Regulators expect results by next year.",
+]
+
+
+def test_summary_sentence_split():
+    """Sentences split after . ! or ? plus whitespace, never inside numbers."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Summary sentence splitting")
+    print("="*70)
+    
+    from src import summarize_content
+    
+    result = summarize_content("test_summary_split", text=SUMMARY_TEXT)
+    assert result["key_points"] == SUMMARY_KEY_POINTS, result["key_points"]
+    assert result["summary"] == " ".join(SUMMARY_KEY_POINTS[:3])
+
+
+def test_safe_file_read():
+    """File validation rejects bad types, missing, non-regular and empty files."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Safe file read")
+    print("="*70)
+    
+    import tempfile
+    from src.utils import safe_file_read
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        empty = os.path.join(tmp, "empty.pdf")
+        valid = os.path.join(tmp, "valid.pdf")
+        folder = os.path.join(tmp, "folder.pdf")
+        open(empty, "wb").close()
+        with open(valid, "wb") as f:
+            f.write(b"%PDF-1.4")
+        os.mkdir(folder)
+        
+        assert "Unsupported file type" in safe_file_read(valid, [".wav"])["error"]
+        assert "File not found" in safe_file_read(os.path.join(tmp, "missing.pdf"), [".pdf"])["error"]
+        assert "Not a regular file" in safe_file_read(folder, [".pdf"])["error"]
+        assert safe_file_read(empty, [".pdf"])["error"] == "File is empty"
+        assert safe_file_read(valid, [".pdf"]) == {"status": "success"}
+
+
+@pytest.mark.asyncio
+async def test_tool_calls_serialized_per_user():
+    """Concurrent tool threads share one profile and never interleave updates."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Per-user tool serialization")
+    print("="*70)
+    
+    import time
+    from src.user_model import get_user
+    from src.utils import async_tool_wrapper
+    
+    users = await asyncio.gather(*[
+        asyncio.to_thread(get_user, "test_tool_lock_profile") for _ in range(20)
+    ])
+    assert all(user is users[0] for user in users)
+    
+    def add_point(user_id: str) -> dict:
+        user = get_user(user_id)
+        points = user.total_points
+        time.sleep(0.001)
+        user.total_points = points + 1
+        return {"status": "ok"}
+    
+    tool = async_tool_wrapper(add_point)
+    await asyncio.gather(*[tool(user_id="test_tool_lock") for _ in range(20)])
+    assert get_user("test_tool_lock").total_points == 20
+
+
+def test_inline_batch(monkeypatch):
+    """Batch results come back in order, and a stuck job is cancelled at the deadline."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Inline batch submission")
+    print("="*70)
+    
+    from types import SimpleNamespace
+    from src import batch
+    
+    class FakeBatches:
+        def __init__(self, states, dest=None):
+            self.states = list(states)
+            self.dest = dest
+            self.cancelled = []
+        
+        def _job(self):
+            state = self.states.pop(0) if len(self.states) > 1 else self.states[0]
+            return SimpleNamespace(name="batches/test", state=SimpleNamespace(name=state), dest=self.dest)
+        
+        def create(self, model, src, config):
+            return self._job()
+        
+        def get(self, name):
+            return self._job()
+        
+        def cancel(self, name):
+            self.cancelled.append(name)
+    
+    def use_batches(fake):
+        client = SimpleNamespace(batches=fake)
+        monkeypatch.setattr(batch, "genai", SimpleNamespace(Client=lambda api_key: client), raising=False)
+    
+    monkeypatch.setattr(batch, "GENAI_CLIENT_AVAILABLE", True)
+    monkeypatch.setattr(batch, "BATCH_POLL_INTERVAL_SEC", 0.001)
+    requests = [{"contents": [{"role": "user", "parts": [{"text": str(i)}]}]} for i in range(2)]
+    
+    dest = SimpleNamespace(inlined_responses=[
+        SimpleNamespace(response=SimpleNamespace(text="first"), error=None),
+        SimpleNamespace(response=None, error="quota"),
+    ])
+    use_batches(FakeBatches(["JOB_STATE_PENDING", "JOB_STATE_RUNNING", "JOB_STATE_SUCCEEDED"], dest))
+    assert batch.submit_inline_batch(requests) == [
+        {"status": "success", "text": "first"},
+        {"status": "error", "error": "quota"},
+    ]
+    
+    stuck = FakeBatches(["JOB_STATE_RUNNING"])
+    use_batches(stuck)
+    results = batch.submit_inline_batch(requests, max_wait_sec=0.01)
+    assert results == [{"status": "error", "error": "timeout"}] * 2
+    assert stuck.cancelled == ["batches/test"]
+
+
+def test_interpersonal_typed_text_skips_audio():
+    """Typed text is coached without touching an attached recording."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Interpersonal typed text skips audio")
+    print("="*70)
+    
+    from src import analyze_interpersonal
+    
+    result = analyze_interpersonal(
+        "test_typed_text",
+        text="I feel hurt when you leave early",
+        audio_path="missing_recording.wav"
+    )
+    assert result["status"] == "analyzed"
+    assert result["original_message"] == "I feel hurt when you leave early"
+
+
+def test_audio_features_broken_librosa(monkeypatch):
+    """A librosa that is installed but fails to import degrades to 'limited'."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Audio features with a broken librosa")
+    print("="*70)
+    
+    from src import agents
+    
+    # None in sys.modules makes the import raise ImportError
+    monkeypatch.setitem(sys.modules, "librosa", None)
+    result = agents._compute_audio_features("missing_recording.wav")
+    assert result["status"] == "limited"
+
+
+def test_audio_disk_cache(monkeypatch, tmp_path):
+    """The opt-in disk cache hits, expires by TTL, prunes old entries and is off by default."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Audio disk cache")
+    print("="*70)
+    
+    import time
+    from src import agents, config
+    
+    cache_dir = tmp_path / "audio_cache"
+    monkeypatch.setattr(agents, "AUDIO_CACHE_DIR", cache_dir)
+    features = {"status": "success", "duration_seconds": 1.0}
+    
+    # Disabled by default: nothing is written and nothing is read
+    if "MINDMATE_AUDIO_DISK_CACHE" not in os.environ:
+        assert config.AUDIO_DISK_CACHE_ENABLED is False
+    monkeypatch.setattr(agents, "AUDIO_DISK_CACHE_ENABLED", False)
+    agents._write_audio_cache("off", "hello", features)
+    assert not cache_dir.exists()
+    assert agents._read_audio_cache("off") is None
+    
+    monkeypatch.setattr(agents, "AUDIO_DISK_CACHE_ENABLED", True)
+    monkeypatch.setattr(agents, "AUDIO_CACHE_MAX_ENTRIES", 2)
+    
+    # Hit
+    agents._write_audio_cache("d0", "hello", features)
+    assert agents._read_audio_cache("d0") == {"transcript": "hello", "features": features}
+    assert agents._read_audio_cache("unknown") is None
+    
+    # Pruning keeps only the newest AUDIO_CACHE_MAX_ENTRIES files
+    now = time.time()
+    os.utime(agents._audio_cache_path("d0"), (now - 30, now - 30))
+    agents._write_audio_cache("d1", "one", features)
+    os.utime(agents._audio_cache_path("d1"), (now - 20, now - 20))
+    agents._write_audio_cache("d2", "two", features)
+    assert sorted(p.name.split("-")[0] for p in cache_dir.glob("*.json")) == ["d1", "d2"]
+    
+    # Entries older than the TTL are dropped on read
+    monkeypatch.setattr(agents, "AUDIO_CACHE_TTL_SEC", 10)
+    assert agents._read_audio_cache("d1") is None
+    assert not agents._audio_cache_path("d1").exists()
+    assert agents._read_audio_cache("d2")["transcript"] == "two"
+
+
+def test_audio_feature_lru(monkeypatch, tmp_path):
+    """Features are cached by content digest, least recently used first out."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Audio feature LRU cache")
+    print("="*70)
+    
+    from collections import OrderedDict
+    from src import agents
+    
+    computed = []
+    
+    def fake_compute(audio_path, samples=None):
+        computed.append(audio_path)
+        status = "error" if "bad" in audio_path else "success"
+        return {"status": status, "path": audio_path}
+    
+    monkeypatch.setattr(agents, "LIBROSA_AVAILABLE", True)
+    monkeypatch.setattr(agents, "_compute_audio_features", fake_compute)
+    monkeypatch.setattr(agents, "_audio_feature_cache", OrderedDict())
+    monkeypatch.setattr(agents, "AUDIO_CACHE_SIZE", 2)
+    
+    # Same bytes under two names are analyzed once
+    first, copy = tmp_path / "first.wav", tmp_path / "copy.wav"
+    first.write_bytes(b"RIFF-same-audio")
+    copy.write_bytes(b"RIFF-same-audio")
+    agents.analyze_audio_features(str(first))
+    assert agents.analyze_audio_features(str(copy))["path"] == str(first)
+    assert computed == [str(first)]
+    
+    # "a" is touched after "b", so adding "c" evicts "b"
+    computed.clear()
+    agents._audio_feature_cache.clear()
+    for digest in ("a", "b", "a", "c", "a", "b"):
+        agents.analyze_audio_features(digest, digest=digest)
+    assert computed == ["a", "b", "c", "b"]
+    
+    # Failed analyses are not cached
+    computed.clear()
+    agents.analyze_audio_features("bad", digest="bad")
+    agents.analyze_audio_features("bad", digest="bad")
+    assert computed == ["bad", "bad"]
+
+
+def test_audio_header_duration_check(monkeypatch, tmp_path):
+    """Too-short and too-long clips are rejected from the header, before decoding."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Audio header duration check")
+    print("="*70)
+    
+    from types import SimpleNamespace
+    from src import agents
+    
+    def fake_info(path):
+        if path.endswith(".m4a"):
+            raise RuntimeError("unsupported format")
+        return SimpleNamespace(duration=3.0)
+    
+    monkeypatch.setattr(agents, "SOUNDFILE_AVAILABLE", True)
+    monkeypatch.setitem(sys.modules, "soundfile", SimpleNamespace(info=fake_info))
+    assert agents._audio_header_duration("clip.wav") == 3.0
+    assert agents._audio_header_duration("clip.m4a") is None
+    
+    # The length check runs before any decode or speech-to-text work
+    monkeypatch.setitem(sys.modules, "speech_recognition", SimpleNamespace(UnknownValueError=LookupError))
+    monkeypatch.setattr(agents, "_decode_to_pcm", None)
+    audio = tmp_path / "clip.wav"
+    audio.write_bytes(b"RIFF0000WAVE")
+    
+    for duration, message in ((0.2, "too short"), (agents.MAX_AUDIO_DURATION_SEC + 1, "too long")):
+        monkeypatch.setattr(agents, "_audio_header_duration", lambda path, d=duration: d)
+        result = agents.analyze_interpersonal("test_audio_header", audio_path=str(audio))
+        assert result["status"] == "error"
+        assert message in result["message"], result["message"]
+
+
+@pytest.mark.asyncio
+async def test_orchestrator_sessions(monkeypatch):
+    """chat reuses one session per user; chat_batch keeps order, bounds concurrency and cleans up."""
+    print("\n" + "="*70)
+    print("[UNIT TEST] Orchestrator sessions and batching")
+    print("="*70)
+    
+    from types import SimpleNamespace
+    from src import Orchestrator
+    
+    class FakeSessions:
+        def __init__(self):
+            self.created = []
+            self.deleted = []
+        
+        async def create_session(self, app_name, user_id):
+            session_id = f"s{len(self.created) + 1}"
+            self.created.append(session_id)
+            return SimpleNamespace(id=session_id)
+        
+        async def delete_session(self, app_name, user_id, session_id):
+            self.deleted.append(session_id)
+    
+    class FakeRunner:
+        def __init__(self):
+            self.active = 0
+            self.peak = 0
+            self.session_ids = []
+        
+        async def run_async(self, user_id, session_id, new_message, run_config=None):
+            self.session_ids.append(session_id)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                # Later messages finish first, so gather order is what keeps results ordered
+                await asyncio.sleep(0.001 * (10 - len(self.session_ids) % 10))
+            finally:
+                self.active -= 1
+            if run_config is not None:
+                for chunk in ("Hel", "lo"):
+                    yield _event(chunk, partial=True)
+            yield _event(f"reply:{new_message}")
+    
+    def _event(text, partial=False):
+        return SimpleNamespace(
+            partial=partial,
+            content=SimpleNamespace(parts=[SimpleNamespace(text=text)]),
+            is_final_response=lambda: not partial,
+        )
+    
+    sessions, runner = FakeSessions(), FakeRunner()
+    monkeypatch.setattr(Orchestrator, "get_session_service", lambda: sessions)
+    monkeypatch.setattr(Orchestrator, "get_runner", lambda: runner)
+    monkeypatch.setattr(Orchestrator, "_user_message", lambda message: message)
+    monkeypatch.setattr(Orchestrator, "_SESSIONS", {})
+    monkeypatch.setattr(Orchestrator, "MAX_CONCURRENCY", 2)
+    
+    # chat: one session per user until reset_session
+    assert await Orchestrator.chat("sam_1", "hi") == "reply:hi"
+    await Orchestrator.chat("sam_1", "again")
+    assert runner.session_ids == ["s1", "s1"]
+    await Orchestrator.reset_session("sam_1")
+    assert sessions.deleted == ["s1"]
+    await Orchestrator.chat("sam_1", "fresh")
+    assert runner.session_ids[-1] == "s2"
+    
+    # stream_chat yields the partial chunks, not the final duplicate
+    run_config = SimpleNamespace(RunConfig=lambda streaming_mode: streaming_mode, StreamingMode=SimpleNamespace(SSE="sse"))
+    monkeypatch.setitem(sys.modules, "google.adk.agents.run_config", run_config)
+    assert [chunk async for chunk in Orchestrator.stream_chat("sam_1", "stream")] == ["Hel", "lo"]
+    
+    # chat_batch: input order, at most MAX_CONCURRENCY runs, every session deleted
+    sessions.deleted.clear()
+    runner.peak = 0
+    messages = [(f"user_{i}", f"m{i}") for i in range(6)]
+    replies = await Orchestrator.chat_batch(messages)
+    assert replies == [f"reply:m{i}" for i in range(6)]
+    assert runner.peak == 2
+    assert len(sessions.deleted) == 6
+    assert set(sessions.deleted) == set(runner.session_ids[-6:])
+
+
 def test_imports():
     """Test that all required modules can be imported."""
     print("\n" + "="*70)